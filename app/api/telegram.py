@@ -6,6 +6,7 @@ from app.services.telegram_service import telegram_service
 from app.services.dialog_service import DialogService
 from app.core.config import settings
 from app.core.database import get_session_local
+from app.utils.robust_date_parser import set_request_now, reset_request_now
 
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
@@ -23,42 +24,49 @@ async def process_telegram_update(update: Update):
         user_id = update.message.from_user.id if update.message.from_user else chat_id
         text = update.message.text
         
-        # Создаем сессию базы данных для обработки сообщения
-        SessionLocal = get_session_local()
-        db: Session = SessionLocal()
+        # Фиксируем "сейчас" один раз на все даты, которые распарсим при обработке сообщения
+        now_token = set_request_now()
+        
         try:
-            # Создаем экземпляр DialogService с сессией БД
-            dialog_service = DialogService(db)
-            
-            # Проверяем, является ли сообщение командой /clear
-            if text.strip().lower() == "/clear":
-                # Очищаем историю диалога пользователя
-                deleted_count = dialog_service.clear_history(user_id)
-                
-                # Отправляем подтверждение
-                confirmation_message = (
-                    "✨ История диалога успешно очищена!\n\n"
-                    "Теперь вы можете начать новый разговор с чистого листа."
-                )
-                await telegram_service.send_message(chat_id, confirmation_message)
-            else:
-                # Обрабатываем обычное сообщение пользователя и получаем ответ от AI
-                bot_response = await dialog_service.process_user_message(user_id, text)
+            # Создаем сессию базы данных для обработки сообщения
+            SessionLocal = get_session_local()
+            db: Session = SessionLocal()
+            try:
+                # Создаем экземпляр DialogService с сессией БД
+                dialog_service = DialogService(db)
                 
-                # Отправляем ответ пользователю
-                await telegram_service.send_message(chat_id, bot_response)
-        except Exception as e:
-            # В случае ошибки отправляем пользователю дружелюбное сообщение
-            error_message = "Извините, произошла ошибка при обработке вашего сообщения. Пожалуйста, попробуйте еще раз."
-            await telegram_service.send_message(chat_id, error_message)
-            # Логируем ошибку для отладки с более подробной информацией
-            logger.error(f"❌ Ошибка обработки сообщения: {e}")
-            logger.error(f"❌ Тип ошибки: {type(e).__name__}")
-            import traceback
-            logger.error(f"❌ Трассировка: {traceback.format_exc()}")
+                # Проверяем, является ли сообщение командой /clear
+                if text.strip().lower() == "/clear":
+                    # Очищаем историю диалога пользователя
+                    deleted_count = dialog_service.clear_history(user_id)
+                    
+                    # Отправляем подтверждение
+                    confirmation_message = (
+                        "✨ История диалога успешно очищена!\n\n"
+                        "Теперь вы можете начать новый разговор с чистого листа."
+                    )
+                    await telegram_service.send_message(chat_id, confirmation_message)
+                else:
+                    # Обрабатываем обычное сообщение пользователя и получаем ответ от AI
+                    bot_response = await dialog_service.process_user_message(user_id, text)
+                    
+                    # Отправляем ответ пользователю
+                    await telegram_service.send_message(chat_id, bot_response)
+            except Exception as e:
+                # В случае ошибки отправляем пользователю дружелюбное сообщение
+                error_message = "Извините, произошла ошибка при обработке вашего сообщения. Пожалуйста, попробуйте еще раз."
+                await telegram_service.send_message(chat_id, error_message)
+                # Логируем ошибку для отладки с более подробной информацией
+                logger.error(f"❌ Ошибка обработки сообщения: {e}")
+                logger.error(f"❌ Тип ошибки: {type(e).__name__}")
+                import traceback
+                logger.error(f"❌ Трассировка: {traceback.format_exc()}")
+            finally:
+                # Всегда закрываем сессию БД
+                db.close()
         finally:
-            # Всегда закрываем сессию БД
-            db.close()
+            # Сбрасываем "сейчас" независимо от того, удалось ли открыть и закрыть сессию БД
+            reset_request_now(now_token)
 
 
 @router.post(f"/{settings.TELEGRAM_BOT_TOKEN}", include_in_schema=False)
@@ -5,7 +5,10 @@
 которая обрабатывает все возможные форматы и вариации, включая ошибки нейронки.
 """
 
-from datetime import datetime, timedelta
+from contextvars import ContextVar, Token
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Optional, Tuple, List, Dict, Any
 from dateutil import parser
 import re
@@ -13,6 +16,116 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Текущее время, зафиксированное на время обработки одного входящего обновления
+_request_now: ContextVar[Optional[datetime]] = ContextVar('request_now', default=None)
+
+# Максимальная длина строки, которую разбирает нечеткий парсер
+_FUZZY_MAX_INPUT_LENGTH = 64
+
+# Граница кодов символов (до конца блока General Punctuation), которые чистит нечеткий парсер
+_FUZZY_DELETE_TABLE_LIMIT = 0x2070
+
+
+def _build_trie_regex(words: List[str]) -> str:
+    """
+    Строит регулярное выражение из списка слов, объединяя общие префиксы.
+    
+    Вместо наивного 'январь|января|янв' получается 'янв(?:ар[ья])?',
+    поэтому движок регулярок отсекает несовпадающие варианты на первом символе.
+    
+    Args:
+        words: Список слов для альтернативы
+        
+    Returns:
+        Исходный текст регулярного выражения (без захватывающей группы)
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None
+    return _trie_node_to_regex(trie)
+
+
+def _trie_node_to_regex(node: Dict[str, Any]) -> str:
+    """Рекурсивно превращает узел префиксного дерева в регулярное выражение."""
+    optional = '' in node
+    branches = []
+    single_chars = []
+    for char in sorted(key for key in node if key):
+        suffix = _trie_node_to_regex(node[char])
+        if suffix:
+            branches.append(re.escape(char) + suffix)
+        else:
+            single_chars.append(re.escape(char))
+    
+    if single_chars:
+        branches.append(single_chars[0] if len(single_chars) == 1 else '[' + ''.join(single_chars) + ']')
+    
+    if not branches:
+        return ''
+    
+    # Одиночный символ или класс символов не требует группировки
+    if len(branches) == 1 and (single_chars or not optional):
+        result = branches[0]
+    else:
+        result = '(?:' + '|'.join(branches) + ')'
+    
+    return result + '?' if optional else result
+
+
+def _has_cyrillic(text: str) -> bool:
+    """Проверяет, содержит ли строка символы кириллицы (в любом регистре)."""
+    return any('\u0400' <= c <= '\u04ff' for c in text)
+
+
+def _extract_numbers(text: str, limit: int) -> List[int]:
+    """
+    Извлекает из строки первые limit чисел за один проход.
+    
+    Args:
+        text: Исходная строка
+        limit: Максимальное количество чисел
+        
+    Returns:
+        Список найденных чисел
+    """
+    numbers = []
+    start = None
+    for index, char in enumerate(text):
+        if char.isdecimal():
+            if start is None:
+                start = index
+        elif start is not None:
+            numbers.append(int(text[start:index]))
+            start = None
+            if len(numbers) == limit:
+                return numbers
+    if start is not None:
+        numbers.append(int(text[start:]))
+    return numbers
+
+
+def _parse_iso_date(date_str: str) -> Optional[str]:
+    """
+    Быстрый путь для строк строго в формате YYYY-MM-DD.
+    
+    Args:
+        date_str: Строка с датой
+        
+    Returns:
+        Дата в формате YYYY-MM-DD или None, если строка не в ISO формате
+    """
+    # fromisoformat в Python 3.11+ принимает и другие ISO формы (YYYYMMDD, недели),
+    # поэтому сначала проверяем точную форму
+    if len(date_str) != 10 or date_str[4] != '-' or date_str[7] != '-':
+        return None
+    try:
+        return date.fromisoformat(date_str).isoformat()
+    except ValueError:
+        return None
+
 
 class RobustDateParser:
     """
@@ -27,9 +140,17 @@ class RobustDateParser:
     - Нечеткие совпадения
     """
     
+    __slots__ = (
+        'russian_months', 'russian_days', 'relative_dates',
+        '_relative_re', '_months_trie_src', '_days_trie_src', '_date_patterns_re',
+        '_weekday_dmy_re', '_weekday_month_re', '_day_month_year_re', '_month_day_year_re',
+        '_fuzzy_delete_table', '_fuzzy_corrections', '_parse_date_cached', '_fuzzy_canonicalize_cached',
+    )
+    
     def __init__(self):
         """Инициализирует парсер с настройками."""
-        self.russian_months = {
+        # Справочники только для чтения
+        self.russian_months = MappingProxyType({
             'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
             'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
             'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12,
@@ -37,38 +158,81 @@ class RobustDateParser:
             'май': 5, 'июнь': 6, 'июль': 7, 'август': 8,
             'сентябрь': 9, 'октябрь': 10, 'ноябрь': 11, 'декабрь': 12,
             'янв': 1, 'фев': 2, 'мар': 3, 'апр': 4,
-            'май': 5, 'июн': 6, 'июл': 7, 'авг': 8,
+            'июн': 6, 'июл': 7, 'авг': 8,
             'сен': 9, 'окт': 10, 'ноя': 11, 'дек': 12
-        }
+        })
         
-        self.russian_days = {
+        self.russian_days = MappingProxyType({
             'понедельник': 0, 'вторник': 1, 'среда': 2, 'четверг': 3,
             'пятница': 4, 'суббота': 5, 'воскресенье': 6,
             'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6
-        }
+        })
         
-        self.relative_dates = {
+        self.relative_dates = MappingProxyType({
             'сегодня': 0, 'завтра': 1, 'послезавтра': 2,
             'через неделю': 7, 'через месяц': 30
-        }
+        })
+        
+        # Относительные даты одним проходом; длинные варианты первыми,
+        # чтобы "послезавтра" не распознавалось как "завтра"
+        self._relative_re = re.compile(
+            '|'.join(map(re.escape, sorted(self.relative_dates, key=len, reverse=True)))
+        )
         
-        # Паттерны для различных форматов дат
-        self.date_patterns = [
+        # Альтернативы названий месяцев и дней недели в виде префиксного дерева
+        self._months_trie_src = _build_trie_regex(list(self.russian_months))
+        self._days_trie_src = _build_trie_regex(list(self.russian_days))
+        
+        # Числовые форматы дат одним регулярным выражением: формат определяется по имени
+        # сработавшей группы, а компоненты даты - три следующие за ней группы
+        self._date_patterns_re = re.compile(
             # DD.MM.YYYY
-            r'(\d{1,2})\.(\d{1,2})\.(\d{4})',
-            # DD/MM/YYYY
-            r'(\d{1,2})/(\d{1,2})/(\d{4})',
+            r'(?P<dmy_dot>(\d{1,2})\.(\d{1,2})\.(\d{4}))'
+            # MM/DD/YYYY (американский формат)
+            r'|(?P<mdy_slash>(\d{1,2})/(\d{1,2})/(\d{4}))'
             # YYYY-MM-DD
-            r'(\d{4})-(\d{1,2})-(\d{1,2})',
+            r'|(?P<ymd_dash>(\d{4})-(\d{1,2})-(\d{1,2}))'
             # DD-MM-YYYY
-            r'(\d{1,2})-(\d{1,2})-(\d{4})',
-            # DD месяц YYYY
-            r'(\d{1,2})\s+(' + '|'.join(self.russian_months.keys()) + r')(?:\s+(\d{4}))?',
-            # день недели, DD месяц YYYY (как в логах)
-            r'(' + '|'.join(self.russian_days.keys()) + r'),?\s+(\d{1,2})\.(\d{1,2})\.(\d{4})',
-            # день недели DD месяц YYYY
-            r'(' + '|'.join(self.russian_days.keys()) + r'),?\s+(\d{1,2})\s+(' + '|'.join(self.russian_months.keys()) + r')(?:\s+(\d{4}))?',
+            r'|(?P<dmy_dash>(\d{1,2})-(\d{1,2})-(\d{4}))'
+        )
+        
+        # Русские форматы с днями недели и названиями месяцев (именованные группы day/month/year)
+        day_src = r'(?P<day>\d{1,2})'
+        month_name_src = r'(?P<month>' + self._months_trie_src + r')'
+        year_src = r'(?:\s+(?P<year>\d{4}))?'
+        # "Пятница, 17.10.2025" или "Пятница 17.10.2025"
+        self._weekday_dmy_re = re.compile(
+            r'(?:' + self._days_trie_src + r'),?\s+' + day_src + r'\.(?P<month>\d{1,2})\.(?P<year>\d{4})'
+        )
+        # "Пятница, 17 октября 2025" или "Пятница 17 октября 2025"
+        self._weekday_month_re = re.compile(
+            r'(?:' + self._days_trie_src + r'),?\s+' + day_src + r'\s+' + month_name_src + year_src
+        )
+        # "17 октября 2025" (без дня недели)
+        self._day_month_year_re = re.compile(day_src + r'\s+' + month_name_src + year_src)
+        # "октябрь 17 2025" (месяц день год)
+        self._month_day_year_re = re.compile(month_name_src + r'\s+' + day_src + year_src)
+        
+        # Очистка и исправления для нечеткого парсинга
+        # Таблица удаления для str.translate: все, кроме букв, цифр, '_', пробелов и '.-/'
+        # (как [^\d\w\s\.\-\/]); покрываем латиницу, кириллицу и общую пунктуацию
+        self._fuzzy_delete_table = {
+            code: None for code in range(_FUZZY_DELETE_TABLE_LIMIT)
+            if not (chr(code).isalnum() or chr(code).isspace() or chr(code) in '_.-/')
+        }
+        self._fuzzy_corrections = [
+            # Заменяем запятые на точки
+            (re.compile(r','), '.'),
+            # Исправляем двойные точки
+            (re.compile(r'\.\.'), '.'),
+            # Исправляем пробелы в датах
+            (re.compile(r'(\d)\s+(\d)'), r'\1\2'),
         ]
+        
+        # Кэш результатов: одни и те же строки дат приходят в диалоге многократно
+        self._parse_date_cached = lru_cache(maxsize=4096)(self._parse_normalized)
+        # Отдельный кэш очистки: parse_date_with_fallback не нормализует ввод и не использует кэш выше
+        self._fuzzy_canonicalize_cached = lru_cache(maxsize=1024)(self._fuzzy_canonicalize)
     
     def parse_date(self, date_str: str, reference_date: Optional[datetime] = None) -> Optional[str]:
         """
@@ -83,204 +247,161 @@ class RobustDateParser:
         """
         if not date_str or not isinstance(date_str, str):
             return None
+        
+        # Стратегия 0: дата уже в ISO формате (например, ранее выданная этим же парсером)
+        result = _parse_iso_date(date_str)
+        if result:
+            return result
             
         if reference_date is None:
-            reference_date = datetime.now()
+            reference_date = _request_now.get() or datetime.now()
+        
+        # Результат зависит только от нормализованной строки и календарного дня опорной даты
+        return self._parse_date_cached(date_str.strip().lower(), reference_date.toordinal())
+    
+    def cache_clear(self) -> None:
+        """Очищает кэш результатов парсинга."""
+        self._parse_date_cached.cache_clear()
+        self._fuzzy_canonicalize_cached.cache_clear()
+    
+    def _parse_normalized(self, date_str: str, reference_ordinal: int) -> Optional[str]:
+        """
+        Прогоняет нормализованную строку через все стратегии парсинга.
+        
+        Args:
+            date_str: Строка с датой (без пробелов по краям, в нижнем регистре)
+            reference_ordinal: Порядковый номер дня опорной даты (datetime.toordinal)
             
-        date_str = date_str.strip().lower()
+        Returns:
+            Дата в формате YYYY-MM-DD или None
+        """
+        reference_date = datetime.fromordinal(reference_ordinal)
+        
+        # Один проход по строке, чтобы сразу отбросить стратегии, которые не могут сработать:
+        # относительные даты и русские форматы требуют кириллицы, dateutil - ее отсутствия,
+        # все числовые - цифр, стандартные паттерны - разделителя. Порядок стратегий сохраняется.
+        has_digit = any(c.isdigit() for c in date_str)
+        has_cyrillic = _has_cyrillic(date_str)
+        has_sep = any(c in '.-/' for c in date_str)
         
         # Стратегия 1: Относительные даты
-        result = self._parse_relative_date(date_str, reference_date)
-        if result:
-            logger.debug(f"Относительная дата распознана: {date_str} -> {result}")
-            return result
+        if has_cyrillic:
+            result = self._parse_relative_date(date_str, reference_date)
+            if result:
+                logger.debug(f"Относительная дата распознана: {date_str} -> {result}")
+                return result
         
         # Стратегия 2: Русские форматы с днями недели
-        result = self._parse_russian_with_weekday(date_str, reference_date)
-        if result:
-            logger.debug(f"Русский формат с днем недели: {date_str} -> {result}")
-            return result
+        if has_cyrillic and has_digit:
+            result = self._parse_russian_with_weekday(date_str, reference_date)
+            if result:
+                logger.debug(f"Русский формат с днем недели: {date_str} -> {result}")
+                return result
         
         # Стратегия 3: Стандартные паттерны
-        result = self._parse_patterns(date_str)
-        if result:
-            logger.debug(f"Стандартный паттерн: {date_str} -> {result}")
-            return result
+        if has_digit and has_sep:
+            result = self._parse_patterns(date_str)
+            if result:
+                logger.debug(f"Стандартный паттерн: {date_str} -> {result}")
+                return result
         
         # Стратегия 4: dateutil.parser с настройками
-        result = self._parse_with_dateutil(date_str)
-        if result:
-            logger.debug(f"dateutil.parser: {date_str} -> {result}")
-            return result
+        if not has_cyrillic:
+            result = self._parse_with_dateutil(date_str)
+            if result:
+                logger.debug(f"dateutil.parser: {date_str} -> {result}")
+                return result
         
         # Стратегия 5: Нечеткий поиск и исправление
-        result = self._fuzzy_parse(date_str, reference_date)
-        if result:
-            logger.debug(f"Нечеткий парсинг: {date_str} -> {result}")
-            return result
+        if has_digit:
+            result = self._fuzzy_parse(date_str, reference_date)
+            if result:
+                logger.debug(f"Нечеткий парсинг: {date_str} -> {result}")
+                return result
         
         logger.warning(f"Не удалось распарсить дату: {date_str}")
         return None
     
     def _parse_relative_date(self, date_str: str, reference_date: datetime) -> Optional[str]:
         """Парсинг относительных дат (завтра, послезавтра и т.д.)."""
-        for relative, days in self.relative_dates.items():
-            if relative in date_str:
-                target_date = reference_date + timedelta(days=days)
-                return target_date.strftime("%Y-%m-%d")
+        match = self._relative_re.search(date_str)
+        if match:
+            target_date = reference_date + timedelta(days=self.relative_dates[match.group(0)])
+            return target_date.date().isoformat()
         return None
     
     def _parse_russian_with_weekday(self, date_str: str, reference_date: datetime) -> Optional[str]:
         """Парсинг русских форматов с днями недели."""
         # Паттерн: "Пятница, 17.10.2025" или "Пятница 17.10.2025"
-        weekday_pattern = r'(' + '|'.join(self.russian_days.keys()) + r'),?\s+(\d{1,2})\.(\d{1,2})\.(\d{4})'
-        match = re.search(weekday_pattern, date_str)
-        
+        match = self._weekday_dmy_re.search(date_str)
         if match:
-            weekday_name = match.group(1)
-            day = int(match.group(2))
-            month = int(match.group(3))
-            year = int(match.group(4))
-            
             try:
-                parsed_date = datetime(year, month, day)
-                return parsed_date.strftime("%Y-%m-%d")
+                return date(int(match['year']), int(match['month']), int(match['day'])).isoformat()
             except ValueError:
                 pass
         
-        # Паттерн: "Пятница, 17 октября 2025" или "Пятница 17 октября 2025"
-        weekday_month_pattern = r'(' + '|'.join(self.russian_days.keys()) + r'),?\s+(\d{1,2})\s+(' + '|'.join(self.russian_months.keys()) + r')(?:\s+(\d{4}))?'
-        match = re.search(weekday_month_pattern, date_str)
-        
-        if match:
-            weekday_name = match.group(1)
-            day = int(match.group(2))
-            month_name = match.group(3)
-            year = match.group(4)
-            
-            if not year:
-                year = reference_date.year
-            
-            month = self.russian_months[month_name]
-            
-            try:
-                parsed_date = datetime(int(year), month, day)
-                return parsed_date.strftime("%Y-%m-%d")
-            except ValueError:
-                pass
-        
-        # Паттерн: "17 октября 2025" (без дня недели)
-        month_pattern = r'(\d{1,2})\s+(' + '|'.join(self.russian_months.keys()) + r')(?:\s+(\d{4}))?'
-        match = re.search(month_pattern, date_str)
-        
-        if match:
-            day = int(match.group(1))
-            month_name = match.group(2)
-            year = match.group(3)
-            
-            if not year:
-                year = reference_date.year
-            
-            month = self.russian_months[month_name]
-            
-            try:
-                parsed_date = datetime(int(year), month, day)
-                return parsed_date.strftime("%Y-%m-%d")
-            except ValueError:
-                pass
+        # Паттерны с названием месяца:
+        # "Пятница, 17 октября 2025", "17 октября 2025" и "октябрь 17 2025"
+        for pattern in (self._weekday_month_re, self._day_month_year_re, self._month_day_year_re):
+            match = pattern.search(date_str)
+            if match:
+                result = self._resolve_month_name_match(match, reference_date)
+                if result:
+                    return result
         
-        # Паттерн: "октябрь 17 2025" (месяц день год)
-        month_day_year_pattern = r'(' + '|'.join(self.russian_months.keys()) + r')\s+(\d{1,2})(?:\s+(\d{4}))?'
-        match = re.search(month_day_year_pattern, date_str)
+        return None
+    
+    def _resolve_month_name_match(self, match: re.Match, reference_date: datetime) -> Optional[str]:
+        """Собирает дату из совпадения с группами day, month (название) и необязательной year."""
+        year = match['year']
+        year = int(year) if year else reference_date.year
         
-        if match:
-            month_name = match.group(1)
-            day = int(match.group(2))
-            year = match.group(3)
-            
-            if not year:
-                year = reference_date.year
+        try:
+            return date(year, self.russian_months[match['month']], int(match['day'])).isoformat()
+        except ValueError:
+            return None
+    
+    def _parse_patterns(self, date_str: str) -> Optional[str]:
+        """Парсинг стандартных паттернов дат."""
+        for match in self._date_patterns_re.finditer(date_str):
+            index = match.lastindex
+            first, second, third = (int(value) for value in match.group(index + 1, index + 2, index + 3))
             
-            month = self.russian_months[month_name]
+            kind = match.lastgroup
+            if kind == 'ymd_dash':
+                year, month, day = first, second, third
+            elif kind == 'mdy_slash':
+                month, day, year = first, second, third
+            else:
+                day, month, year = first, second, third
             
             try:
-                parsed_date = datetime(int(year), month, day)
-                return parsed_date.strftime("%Y-%m-%d")
+                return date(year, month, day).isoformat()
             except ValueError:
-                pass
-        
-        return None
-    
-    def _parse_patterns(self, date_str: str) -> Optional[str]:
-        """Парсинг стандартных паттернов дат."""
-        for pattern in self.date_patterns:
-            match = re.search(pattern, date_str)
-            if match:
-                groups = match.groups()
-                
-                # Обработка различных форматов
-                if len(groups) == 3:
-                    # DD.MM.YYYY или DD/MM/YYYY
-                    if '.' in date_str:
-                        day, month, year = groups
-                    elif '/' in date_str:
-                        month, day, year = groups  # Американский формат
-                    else:
-                        day, month, year = groups
-                    
-                    try:
-                        parsed_date = datetime(int(year), int(month), int(day))
-                        return parsed_date.strftime("%Y-%m-%d")
-                    except ValueError:
-                        continue
-                
-                elif len(groups) == 4:
-                    # YYYY-MM-DD
-                    year, month, day = groups[:3]
-                    try:
-                        parsed_date = datetime(int(year), int(month), int(day))
-                        return parsed_date.strftime("%Y-%m-%d")
-                    except ValueError:
-                        continue
+                continue
         
         return None
     
     def _parse_with_dateutil(self, date_str: str) -> Optional[str]:
-        """Парсинг с помощью dateutil.parser с различными настройками."""
-        # Пробуем разные настройки парсера
-        settings_variants = [
-            {'dayfirst': True},
-            {'dayfirst': False},
-            {'dayfirst': True, 'yearfirst': False},
-            {'dayfirst': False, 'yearfirst': True},
-        ]
-        
-        for settings in settings_variants:
-            try:
-                parsed_date = parser.parse(date_str, **settings)
-                return parsed_date.strftime("%Y-%m-%d")
-            except (ValueError, TypeError, OverflowError):
-                continue
+        """Парсинг с помощью dateutil.parser (только для латиницы и чисел)."""
+        # dateutil не понимает русский текст: на кириллице он лишь токенизирует строку и падает
+        if _has_cyrillic(date_str):
+            return None
         
-        return None
+        # Остальные варианты настроек (dayfirst=False, yearfirst) не распознавали ничего сверх
+        # dayfirst=True: dateutil сам меняет день и месяц местами, если день больше 12
+        try:
+            parsed_date = parser.parse(date_str, dayfirst=True)
+            return parsed_date.date().isoformat()
+        except (ValueError, TypeError, OverflowError):
+            return None
     
     def _fuzzy_parse(self, date_str: str, reference_date: datetime) -> Optional[str]:
         """Нечеткий парсинг с попытками исправления."""
-        # Удаляем лишние символы и пробелы
-        cleaned = re.sub(r'[^\d\w\s\.\-\/]', '', date_str).strip()
-        
-        # Пробуем исправить очевидные ошибки
-        corrections = [
-            # Заменяем запятые на точки
-            (r',', '.'),
-            # Исправляем двойные точки
-            (r'\.\.', '.'),
-            # Исправляем пробелы в датах
-            (r'(\d)\s+(\d)', r'\1\2'),
-        ]
+        # Строка длиннее любой разумной даты - обрезаем, чтобы не гонять по ней регулярки
+        date_str = date_str[:_FUZZY_MAX_INPUT_LENGTH]
         
-        for pattern, replacement in corrections:
-            cleaned = re.sub(pattern, replacement, cleaned)
+        cleaned = self._fuzzy_canonicalize_cached(date_str)
         
         # Пробуем парсить исправленную строку
         if cleaned != date_str:
@@ -289,25 +410,35 @@ class RobustDateParser:
                 return result
         
         # Пробуем извлечь числа и составить дату
-        numbers = re.findall(r'\d+', date_str)
+        numbers = _extract_numbers(date_str, limit=3)
         if len(numbers) >= 2:
             # Пробуем разные комбинации
-            for day, month in [(int(numbers[0]), int(numbers[1])), (int(numbers[1]), int(numbers[0]))]:
+            for day, month in [(numbers[0], numbers[1]), (numbers[1], numbers[0])]:
                 if 1 <= day <= 31 and 1 <= month <= 12:
                     year = reference_date.year
                     if len(numbers) >= 3:
-                        year = int(numbers[2])
+                        year = numbers[2]
                         if year < 100:  # Двухзначный год
                             year += 2000 if year < 50 else 1900
                     
                     try:
-                        parsed_date = datetime(year, month, day)
-                        return parsed_date.strftime("%Y-%m-%d")
+                        return date(year, month, day).isoformat()
                     except ValueError:
                         continue
         
         return None
     
+    def _fuzzy_canonicalize(self, date_str: str) -> str:
+        """Очищает строку от мусора и исправляет очевидные ошибки формата (результат кэшируется)."""
+        # Удаляем лишние символы и пробелы
+        cleaned = date_str.translate(self._fuzzy_delete_table).strip()
+        
+        # Пробуем исправить очевидные ошибки
+        for pattern, replacement in self._fuzzy_corrections:
+            cleaned = pattern.sub(replacement, cleaned)
+        
+        return cleaned
+    
     def parse_date_with_fallback(self, date_str: str, reference_date: Optional[datetime] = None) -> Tuple[Optional[str], Dict[str, Any]]:
         """
         Парсинг даты с подробной информацией о процессе и fallback стратегиях.
@@ -328,68 +459,60 @@ class RobustDateParser:
         }
         
         if reference_date is None:
-            reference_date = datetime.now()
-        
-        # Стратегия 1: Относительные даты
-        try:
-            result = self._parse_relative_date(date_str, reference_date)
-            metadata['attempts'].append('relative_date')
-            if result:
-                metadata['success'] = True
-                metadata['method_used'] = 'relative_date'
-                return result, metadata
-        except Exception as e:
-            metadata['errors'].append(f'relative_date: {str(e)}')
-        
-        # Стратегия 2: Русские форматы
-        try:
-            result = self._parse_russian_with_weekday(date_str, reference_date)
-            metadata['attempts'].append('russian_weekday')
-            if result:
-                metadata['success'] = True
-                metadata['method_used'] = 'russian_weekday'
-                return result, metadata
-        except Exception as e:
-            metadata['errors'].append(f'russian_weekday: {str(e)}')
-        
-        # Стратегия 3: Стандартные паттерны
-        try:
-            result = self._parse_patterns(date_str)
-            metadata['attempts'].append('patterns')
-            if result:
-                metadata['success'] = True
-                metadata['method_used'] = 'patterns'
-                return result, metadata
-        except Exception as e:
-            metadata['errors'].append(f'patterns: {str(e)}')
-        
-        # Стратегия 4: dateutil
-        try:
-            result = self._parse_with_dateutil(date_str)
-            metadata['attempts'].append('dateutil')
-            if result:
-                metadata['success'] = True
-                metadata['method_used'] = 'dateutil'
-                return result, metadata
-        except Exception as e:
-            metadata['errors'].append(f'dateutil: {str(e)}')
-        
-        # Стратегия 5: Нечеткий поиск
-        try:
-            result = self._fuzzy_parse(date_str, reference_date)
-            metadata['attempts'].append('fuzzy')
+            reference_date = _request_now.get() or datetime.now()
+        
+        # Стратегии в порядке приоритета: (имя, метод, нужна ли опорная дата)
+        strategies = (
+            ('relative_date', self._parse_relative_date, True),
+            ('russian_weekday', self._parse_russian_with_weekday, True),
+            ('patterns', self._parse_patterns, False),
+            ('dateutil', self._parse_with_dateutil, False),
+            ('fuzzy', self._fuzzy_parse, True),
+        )
+        
+        for name, strategy, needs_reference in strategies:
+            try:
+                result = strategy(date_str, reference_date) if needs_reference else strategy(date_str)
+            except Exception as e:
+                metadata['errors'].append(f'{name}: {str(e)}')
+                continue
+            
+            metadata['attempts'].append(name)
             if result:
                 metadata['success'] = True
-                metadata['method_used'] = 'fuzzy'
+                metadata['method_used'] = name
                 return result, metadata
-        except Exception as e:
-            metadata['errors'].append(f'fuzzy: {str(e)}')
         
         return None, metadata
 
 
-# Глобальный экземпляр парсера
-_parser_instance = RobustDateParser()
+def set_request_now(now: Optional[datetime] = None) -> Token:
+    """
+    Фиксирует текущее время для всех парсингов дат в рамках одного запроса.
+    
+    Args:
+        now: Текущее время (по умолчанию - datetime.now())
+        
+    Returns:
+        Токен для восстановления предыдущего значения через reset_request_now
+    """
+    return _request_now.set(now or datetime.now())
+
+
+def reset_request_now(token: Token) -> None:
+    """
+    Сбрасывает время, зафиксированное через set_request_now.
+    
+    Args:
+        token: Токен, полученный от set_request_now
+    """
+    _request_now.reset(token)
+
+
+@lru_cache(maxsize=1)
+def _get_parser() -> RobustDateParser:
+    """Возвращает глобальный экземпляр парсера, создавая его при первом обращении."""
+    return RobustDateParser()
 
 
 def parse_date_robust(date_str: str, reference_date: Optional[datetime] = None) -> Optional[str]:
@@ -403,7 +526,16 @@ def parse_date_robust(date_str: str, reference_date: Optional[datetime] = None)
     Returns:
         Дата в формате YYYY-MM-DD или None
     """
-    return _parser_instance.parse_date(date_str, reference_date)
+    return _get_parser().parse_date(date_str, reference_date)
+
+
+def clear_date_cache() -> None:
+    """Очищает кэш результатов глобального парсера дат."""
+    _get_parser().cache_clear()
+
+
+# Сохраняем привычный интерфейс lru_cache: parse_date_robust.cache_clear()
+parse_date_robust.cache_clear = clear_date_cache
 
 
 def parse_date_with_metadata(date_str: str, reference_date: Optional[datetime] = None) -> Tuple[Optional[str], Dict[str, Any]]:
@@ -417,7 +549,7 @@ def parse_date_with_metadata(date_str: str, reference_date: Optional[datetime] =
     Returns:
         Кортеж (результат, метаданные)
     """
-    return _parser_instance.parse_date_with_fallback(date_str, reference_date)
+    return _get_parser().parse_date_with_fallback(date_str, reference_date)
 
 
 def validate_date_format(date_str: str) -> bool:
@@ -430,6 +562,9 @@ def validate_date_format(date_str: str) -> bool:
     Returns:
         True если строка является валидной датой
     """
+    if _parse_iso_date(date_str):
+        return True
+    
     try:
         datetime.strptime(date_str, "%Y-%m-%d")
         return True
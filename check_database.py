@@ -1,4 +1,5 @@
 """Скрипт для проверки содержимого базы данных"""
+from sqlalchemy.orm import selectinload
 from app.core.database import get_session_local
 from app.models.service import Service
 from app.models.master import Master
@@ -9,27 +10,29 @@ def main():
     
     try:
         services = db.query(Service).all()
-        masters = db.query(Master).all()
+        # Услуги мастеров загружаем одним дополнительным запросом, а не по запросу на мастера
+        masters = db.query(Master).options(selectinload(Master.services)).all()
         
-        print("\n" + "="*60)
-        print("СОДЕРЖИМОЕ БАЗЫ ДАННЫХ")
-        print("="*60)
-        
-        print(f"\n📋 Услуги ({len(services)}):")
+        # Собираем отчет целиком и выводим одной записью
+        lines = [
+            "\n" + "="*60,
+            "СОДЕРЖИМОЕ БАЗЫ ДАННЫХ",
+            "="*60,
+            f"\n📋 Услуги ({len(services)}):",
+        ]
         for service in services:
-            print(f"  • {service.name} - {service.price}₽ ({service.duration_minutes} мин)")
+            lines.append(f"  • {service.name} - {service.price}₽ ({service.duration_minutes} мин)")
         
-        print(f"\n👤 Мастера ({len(masters)}):")
+        lines.append(f"\n👤 Мастера ({len(masters)}):")
         for master in masters:
-            master_services = [s.name for s in master.services]
-            print(f"  • {master.name}")
-            print(f"    Услуги: {', '.join(master_services)}")
+            lines.append(f"  • {master.name}")
+            lines.append(f"    Услуги: {', '.join(s.name for s in master.services)}")
         
-        print("\n" + "="*60 + "\n")
+        lines.append("\n" + "="*60 + "\n")
+        print("\n".join(lines))
         
     finally:
         db.close()
 
 if __name__ == "__main__":
     main()
-
@@ -5,71 +5,222 @@ Flask-приложение для редактирования конфигур
 
 import os
 import json
-import re
-import shutil
-from flask import Flask, request, jsonify, render_template
+import hashlib
+from typing import Dict, Iterable, Optional, Tuple
+from flask import Flask, request, jsonify, send_from_directory
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен - сериализуем стандартным json
+    orjson = None
+
+
+class ORJSONProvider(JSONProvider):
+    """
+    JSON-провайдер Flask на orjson: ускоряет jsonify во всех эндпоинтах редактора.
+    
+    Ключи сортируются, а неизвестные типы сериализуются так же, как в стандартном провайдере.
+    """
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=orjson.OPT_SORT_KEYS).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 # Создаем экземпляр Flask-приложения
 app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 
 # Пути к целевым файлам (относительно корня проекта)
 PATTERNS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'dialogue_patterns.json')
 PROMPTS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app', 'services', 'prompt_builder_service.py')
 
+# Каталог со страницей редактора
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# Хэш содержимого, сохраненного в последнюю резервную копию каждого файла
+_backup_hashes: Dict[str, bytes] = {}
+
+# Готовое тело ответа GET /api/patterns: (mtime_ns, размер файла) -> JSON
+_patterns_response_cache: Dict[Tuple[int, int], str] = {}
+
+# Шаблоны в prompt_builder_service.py (в порядке следования в файле) и поля API
+TEMPLATE_FIELDS = (
+    ('CLASSIFICATION_TEMPLATE', 'classification'),
+    ('THINKING_TEMPLATE', 'thinking'),
+    ('SYNTHESIS_TEMPLATE', 'synthesis'),
+)
+
+# Обязательные поля запроса POST /api/prompts
+REQUIRED_PROMPT_FIELDS = frozenset(field for _, field in TEMPLATE_FIELDS)
+
+
+def _find_template_body(content: str, template_name: str, start: int = 0) -> Optional[Tuple[int, int]]:
+    """
+    Находит границы содержимого шаблона (NAME = и текст в тройных кавычках) поиском подстрок.
+    
+    Args:
+        content: Содержимое файла
+        template_name: Имя переменной шаблона
+        start: Позиция, с которой начинается поиск
+        
+    Returns:
+        Кортеж (начало, конец) содержимого между тройными кавычками или None
+    """
+    position = content.find(template_name, start)
+    while position != -1:
+        # Пропускаем пробелы вокруг '=' (аналог \s*=\s*)
+        index = position + len(template_name)
+        while index < len(content) and content[index].isspace():
+            index += 1
+        if content.startswith('=', index):
+            index += 1
+            while index < len(content) and content[index].isspace():
+                index += 1
+            if content.startswith('"""', index):
+                body_start = index + 3
+                body_end = content.find('"""', body_start)
+                return (body_start, body_end) if body_end != -1 else None
+        
+        # Это не присваивание (например, self.NAME.format(...)) - ищем дальше
+        position = content.find(template_name, position + len(template_name))
+    
+    return None
+
 
-def create_backup(file_path: str) -> str:
+def parse_json(raw: bytes):
+    """
+    Разбирает JSON из байтов (orjson, если установлен).
+    
+    Args:
+        raw: JSON в кодировке UTF-8
+        
+    Returns:
+        Разобранные данные
+        
+    Raises:
+        ValueError: Если данные не являются корректным JSON
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def serialize_patterns(patterns_data: dict) -> bytes:
+    """
+    Сериализует паттерны в формат dialogue_patterns.json (отступ 2, кириллица без экранирования).
+    
+    Args:
+        patterns_data: Данные паттернов
+        
+    Returns:
+        JSON в кодировке UTF-8
+    """
+    if orjson is not None:
+        return orjson.dumps(patterns_data, option=orjson.OPT_INDENT_2)
+    return json.dumps(patterns_data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def create_backup(file_path: str, data: Optional[bytes] = None) -> str:
     """
     Создает резервную копию файла.
     
     Args:
         file_path: Путь к файлу для резервного копирования
+        data: Уже прочитанное содержимое файла (если None, файл читается здесь)
         
     Returns:
         Путь к созданной резервной копии
     """
     backup_path = file_path + '.bak'
-    shutil.copy(file_path, backup_path)
+    
+    # Файл читается один раз: эти же байты идут и в хеш, и в резервную копию
+    if data is None:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    
+    # Повторное сохранение без изменений: резервная копия уже содержит эти данные
+    content_hash = hashlib.blake2b(data, digest_size=16).digest()
+    if _backup_hashes.get(file_path) == content_hash and os.path.exists(backup_path):
+        return backup_path
+    
+    with open(backup_path, 'wb') as f:
+        f.write(data)
+    _backup_hashes[file_path] = content_hash
     return backup_path
 
 
-def extract_template_content(content: str, template_name: str) -> str:
+def extract_templates(content: str, template_names: Iterable[str]) -> Dict[str, str]:
     """
-    Извлекает содержимое шаблона из Python-файла с помощью регулярных выражений.
+    Извлекает содержимое нескольких шаблонов за один проход по файлу.
+    
+    Каждый следующий шаблон ищется с конца предыдущего, поэтому при совпадении
+    порядка имен с порядком в файле файл просматривается один раз.
     
     Args:
         content: Содержимое файла
-        template_name: Имя переменной шаблона
+        template_names: Имена переменных шаблонов
         
     Returns:
-        Содержимое шаблона
+        Словарь {имя шаблона: содержимое}
     """
-    # Паттерн для поиска переменной с тройными кавычками
-    pattern = rf'{template_name}\s*=\s*"""([\s\S]*?)"""'
-    match = re.search(pattern, content)
+    templates = {}
+    position = 0
     
-    if match:
-        return match.group(1).strip()
-    else:
-        return ""
+    for template_name in template_names:
+        span = _find_template_body(content, template_name, position)
+        if span is None and position:
+            # Шаблон расположен раньше предыдущего - ищем с начала файла
+            span = _find_template_body(content, template_name)
+        
+        if span:
+            templates[template_name] = content[span[0]:span[1]].strip()
+            position = span[1] + 3
+        else:
+            templates[template_name] = ""
+    
+    return templates
 
 
-def replace_template_content(content: str, template_name: str, new_content: str) -> str:
+def replace_templates(content: str, replacements: Dict[str, str]) -> str:
     """
-    Заменяет содержимое шаблона в Python-файле.
+    Заменяет содержимое нескольких шаблонов, собирая файл из срезов за один проход.
     
     Args:
         content: Содержимое файла
-        template_name: Имя переменной шаблона
-        new_content: Новое содержимое шаблона
+        replacements: Словарь {имя шаблона: новое содержимое}
         
     Returns:
         Обновленное содержимое файла
     """
-    # Паттерн для замены содержимого между тройными кавычками
-    pattern = rf'({template_name}\s*=\s*""")[\s\S]*?(""")'
-    replacement = rf'\1{new_content}\2'
+    spans = []
+    position = 0
+    
+    for template_name, new_content in replacements.items():
+        span = _find_template_body(content, template_name, position)
+        if span is None and position:
+            span = _find_template_body(content, template_name)
+        
+        if span:
+            spans.append((span[0], span[1], new_content))
+            position = span[1] + 3
+    
+    parts = []
+    last_end = 0
+    for start, end, new_content in sorted(spans):
+        if start < last_end:
+            # Совпадение внутри уже замененного шаблона - пропускаем
+            continue
+        parts.append(content[last_end:start])
+        parts.append(new_content)
+        last_end = end
+    parts.append(content[last_end:])
     
-    return re.sub(pattern, replacement, content)
+    return ''.join(parts)
 
 
 # === API ДЛЯ РАБОТЫ С DIALOGUE_PATTERNS.JSON ===
@@ -83,19 +234,29 @@ def get_patterns():
         JSON с паттернами диалогов
     """
     try:
-        with open(PATTERNS_FILE, 'r', encoding='utf-8') as f:
-            patterns = json.load(f)
+        # Пока файл не менялся, отдаем уже сериализованный ответ без повторного парсинга
+        stat = os.stat(PATTERNS_FILE)
+        cache_key = (stat.st_mtime_ns, stat.st_size)
+        body = _patterns_response_cache.get(cache_key)
         
-        # Обрабатываем поля, которые должны быть списками для отображения в textarea
-        for stage_name, stage_data in patterns.items():
-            if isinstance(stage_data, dict):
-                # Преобразуем списки в строки для отображения в textarea
-                if 'thinking_scenario' in stage_data and isinstance(stage_data['thinking_scenario'], list):
-                    stage_data['thinking_scenario'] = '\n'.join(stage_data['thinking_scenario'])
-                if 'synthesis_scenario' in stage_data and isinstance(stage_data['synthesis_scenario'], list):
-                    stage_data['synthesis_scenario'] = '\n'.join(stage_data['synthesis_scenario'])
+        if body is None:
+            with open(PATTERNS_FILE, 'r', encoding='utf-8') as f:
+                patterns = json.load(f)
+            
+            # Обрабатываем поля, которые должны быть списками для отображения в textarea
+            for stage_name, stage_data in patterns.items():
+                if isinstance(stage_data, dict):
+                    # Преобразуем списки в строки для отображения в textarea
+                    if 'thinking_scenario' in stage_data and isinstance(stage_data['thinking_scenario'], list):
+                        stage_data['thinking_scenario'] = '\n'.join(stage_data['thinking_scenario'])
+                    if 'synthesis_scenario' in stage_data and isinstance(stage_data['synthesis_scenario'], list):
+                        stage_data['synthesis_scenario'] = '\n'.join(stage_data['synthesis_scenario'])
+            
+            body = app.json.dumps(patterns)
+            _patterns_response_cache.clear()
+            _patterns_response_cache[cache_key] = body
         
-        return jsonify(patterns)
+        return app.response_class(body, mimetype='application/json')
     except FileNotFoundError:
         return jsonify({'error': 'Файл dialogue_patterns.json не найден'}), 404
     except json.JSONDecodeError as e:
@@ -113,8 +274,11 @@ def save_patterns():
         JSON с результатом операции
     """
     try:
-        # Получаем данные из запроса
-        patterns_data = request.get_json()
+        # Разбираем сырое тело запроса один раз; сериализуем тоже один раз при записи
+        try:
+            patterns_data = parse_json(request.get_data())
+        except ValueError as e:
+            return jsonify({'error': f'Ошибка парсинга JSON: {str(e)}'}), 400
         
         if not patterns_data:
             return jsonify({'error': 'Отсутствуют данные для сохранения'}), 400
@@ -141,8 +305,9 @@ def save_patterns():
         backup_path = create_backup(PATTERNS_FILE)
         
         # Сохраняем обновленные данные с красивым форматированием
-        with open(PATTERNS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(patterns_data, f, indent=2, ensure_ascii=False)
+        with open(PATTERNS_FILE, 'wb') as f:
+            f.write(serialize_patterns(patterns_data))
+        _patterns_response_cache.clear()
         
         return jsonify({
             'success': True,
@@ -168,16 +333,10 @@ def get_prompts():
         with open(PROMPTS_FILE, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        # Извлекаем содержимое трех шаблонов
-        classification = extract_template_content(content, 'CLASSIFICATION_TEMPLATE')
-        thinking = extract_template_content(content, 'THINKING_TEMPLATE')
-        synthesis = extract_template_content(content, 'SYNTHESIS_TEMPLATE')
+        # Извлекаем содержимое трех шаблонов за один проход
+        templates = extract_templates(content, [name for name, _ in TEMPLATE_FIELDS])
         
-        return jsonify({
-            'classification': classification,
-            'thinking': thinking,
-            'synthesis': synthesis
-        })
+        return jsonify({field: templates[name] for name, field in TEMPLATE_FIELDS})
         
     except FileNotFoundError:
         return jsonify({'error': 'Файл prompt_builder_service.py не найден'}), 404
@@ -200,27 +359,32 @@ def save_prompts():
         if not prompts_data:
             return jsonify({'error': 'Отсутствуют данные для сохранения'}), 400
         
+        if not isinstance(prompts_data, dict):
+            return jsonify({'error': 'Ожидается JSON-объект с шаблонами'}), 400
+        
         # Проверяем наличие всех необходимых ключей
-        required_keys = ['classification', 'thinking', 'synthesis']
-        for key in required_keys:
-            if key not in prompts_data:
-                return jsonify({'error': f'Отсутствует обязательное поле: {key}'}), 400
+        missing = REQUIRED_PROMPT_FIELDS - prompts_data.keys()
+        if missing:
+            return jsonify({'error': f'Отсутствуют обязательные поля: {", ".join(sorted(missing))}'}), 400
+        
+        # Читаем файл один раз: байты идут в резервную копию, текст - в замену шаблонов
+        with open(PROMPTS_FILE, 'rb') as f:
+            raw = f.read()
         
         # Создаем резервную копию
-        backup_path = create_backup(PROMPTS_FILE)
+        backup_path = create_backup(PROMPTS_FILE, raw)
         
-        # Читаем текущее содержимое файла
-        with open(PROMPTS_FILE, 'r', encoding='utf-8') as f:
-            content = f.read()
+        original_content = raw.decode('utf-8')
         
-        # Заменяем содержимое каждого шаблона
-        content = replace_template_content(content, 'CLASSIFICATION_TEMPLATE', prompts_data['classification'])
-        content = replace_template_content(content, 'THINKING_TEMPLATE', prompts_data['thinking'])
-        content = replace_template_content(content, 'SYNTHESIS_TEMPLATE', prompts_data['synthesis'])
+        # Заменяем содержимое всех шаблонов за один проход
+        content = replace_templates(original_content, {
+            name: prompts_data[field] for name, field in TEMPLATE_FIELDS
+        })
         
-        # Сохраняем обновленное содержимое
-        with open(PROMPTS_FILE, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # Сохраняем обновленное содержимое (если шаблоны не изменились, файл не трогаем)
+        if content != original_content:
+            with open(PROMPTS_FILE, 'w', encoding='utf-8') as f:
+                f.write(content)
         
         return jsonify({
             'success': True,
@@ -240,12 +404,14 @@ def index():
     Основная страница редактора.
     
     Returns:
-        HTML-шаблон главной страницы
+        HTML главной страницы
     """
-    return render_template('index.html')
+    # index.html не содержит Jinja-разметки, поэтому отдаем его как статический файл:
+    # без рендеринга и с ETag/Last-Modified для ответов 304 Not Modified
+    return send_from_directory(TEMPLATES_DIR, 'index.html')
 
 
 # === ТОЧКА ВХОДА ДЛЯ ЗАПУСКА ===
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    app.run(debug=bool(os.environ.get('EDITOR_DEBUG')), port=5000)
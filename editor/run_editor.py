@@ -16,4 +16,14 @@ if __name__ == '__main__':
     print("Для остановки нажмите Ctrl+C")
     print("-" * 50)
     
-    app.run(debug=True, port=5000, host='127.0.0.1')
+    if os.environ.get('EDITOR_DEBUG'):
+        # Режим отладки: dev-сервер Flask с отладчиком и автоперезагрузкой
+        app.run(debug=True, port=5000, host='127.0.0.1')
+    else:
+        try:
+            from waitress import serve
+        except ImportError:
+            # waitress не установлен - многопоточный dev-сервер без отладчика
+            app.run(port=5000, host='127.0.0.1', threaded=True)
+        else:
+            serve(app, host='127.0.0.1', port=5000, threads=4)
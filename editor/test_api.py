@@ -4,6 +4,11 @@
 
 import requests
 import json
+from requests.adapters import HTTPAdapter
+
+# Одна сессия на все запросы: keep-alive переиспользует TCP-соединение
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
 
 def test_api():
     """Тестирует основные эндпоинты API."""
@@ -14,7 +19,7 @@ def test_api():
     # Тест 1: Получение паттернов
     print("1. Тестирование GET /api/patterns...")
     try:
-        response = requests.get(f"{base_url}/api/patterns")
+        response = session.get(f"{base_url}/api/patterns")
         if response.status_code == 200:
             patterns = response.json()
             print(f"✓ Успешно получено {len(patterns)} паттернов")
@@ -31,7 +36,7 @@ def test_api():
     # Тест 2: Получение промптов
     print("\n2. Тестирование GET /api/prompts...")
     try:
-        response = requests.get(f"{base_url}/api/prompts")
+        response = session.get(f"{base_url}/api/prompts")
         if response.status_code == 200:
             prompts = response.json()
             print("✓ Успешно получены шаблоны:")
@@ -45,7 +50,7 @@ def test_api():
     # Тест 3: Главная страница
     print("\n3. Тестирование GET /...")
     try:
-        response = requests.get(f"{base_url}/")
+        response = session.get(f"{base_url}/")
         if response.status_code == 200:
             print("✓ Главная страница доступна")
         else:
@@ -4,19 +4,19 @@
 Проверяет корректность обработки списков в многострочных полях.
 """
 
-import requests
-import json
-import time
+import asyncio
+import copy
+import httpx
 
 # URL редактора
 BASE_URL = "http://localhost:5000"
 
-def test_get_patterns():
+async def test_get_patterns(client: httpx.AsyncClient):
     """Тест получения паттернов"""
     print("🔍 Тестируем GET /api/patterns...")
     
     try:
-        response = requests.get(f"{BASE_URL}/api/patterns")
+        response = await client.get("/api/patterns")
         if response.status_code == 200:
             data = response.json()
             print("✅ GET запрос успешен")
@@ -45,7 +45,7 @@ def test_get_patterns():
         print(f"❌ Ошибка GET запроса: {e}")
         return None
 
-def test_save_patterns(original_data):
+async def test_save_patterns(client: httpx.AsyncClient, original_data):
     """Тест сохранения паттернов"""
     print("\n💾 Тестируем POST /api/patterns...")
     
@@ -53,8 +53,9 @@ def test_save_patterns(original_data):
         print("❌ Нет исходных данных для тестирования")
         return False
     
-    # Создаем тестовые данные с многострочными полями
-    test_data = original_data.copy()
+    # Создаем тестовые данные с многострочными полями; глубокая копия,
+    # чтобы правки стадии не затрагивали вложенные словари original_data
+    test_data = copy.deepcopy(original_data)
     
     # Находим первую стадию для тестирования
     first_stage = list(test_data.keys())[0]
@@ -72,11 +73,7 @@ def test_save_patterns(original_data):
     ]
     
     try:
-        response = requests.post(
-            f"{BASE_URL}/api/patterns",
-            headers={'Content-Type': 'application/json'},
-            json=test_data
-        )
+        response = await client.post("/api/patterns", json=test_data)
         
         if response.status_code == 200:
             result = response.json()
@@ -93,22 +90,22 @@ def test_save_patterns(original_data):
         print(f"❌ Ошибка POST запроса: {e}")
         return False
 
-def test_roundtrip():
+async def test_roundtrip(client: httpx.AsyncClient):
     """Тест полного цикла: получение -> изменение -> сохранение -> получение"""
     print("\n🔄 Тестируем полный цикл обработки...")
     
     # 1. Получаем данные
-    original_data = test_get_patterns()
+    original_data = await test_get_patterns(client)
     if not original_data:
         return False
     
     # 2. Сохраняем тестовые данные
-    if not test_save_patterns(original_data):
+    if not await test_save_patterns(client, original_data):
         return False
     
     # 3. Получаем данные снова и проверяем
     print("\n🔍 Проверяем сохраненные данные...")
-    updated_data = test_get_patterns()
+    updated_data = await test_get_patterns(client)
     if not updated_data:
         return False
     
@@ -133,29 +130,39 @@ def test_roundtrip():
     
     return True
 
-def main():
+async def check_server(client: httpx.AsyncClient) -> bool:
+    """Проверяет доступность страницы и обоих API одновременно"""
+    try:
+        responses = await asyncio.gather(
+            client.get("/"),
+            client.get("/api/patterns"),
+            client.get("/api/prompts"),
+        )
+    except httpx.HTTPError:
+        return False
+    
+    return all(response.status_code == 200 for response in responses)
+
+async def run_tests():
     """Основная функция тестирования"""
     print("🚀 Запуск тестирования редактора персоны")
     print("=" * 50)
     
     # Ждем запуска сервера
     print("⏳ Ожидаем запуска сервера...")
-    time.sleep(2)
+    await asyncio.sleep(2)
     
-    # Проверяем доступность сервера
-    try:
-        response = requests.get(f"{BASE_URL}/")
-        if response.status_code != 200:
+    # Один клиент на все запросы: соединение переиспользуется
+    async with httpx.AsyncClient(base_url=BASE_URL) as client:
+        # Проверяем доступность сервера
+        if not await check_server(client):
             print("❌ Сервер недоступен")
             return
-    except:
-        print("❌ Сервер недоступен")
-        return
-    
-    print("✅ Сервер доступен")
-    
-    # Запускаем тесты
-    success = test_roundtrip()
+        
+        print("✅ Сервер доступен")
+        
+        # Запускаем тесты (GET -> POST -> GET выполняются последовательно)
+        success = await test_roundtrip(client)
     
     print("\n" + "=" * 50)
     if success:
@@ -166,5 +173,9 @@ def main():
     
     return success
 
+def main():
+    """Точка входа: запускает асинхронные тесты"""
+    return asyncio.run(run_tests())
+
 if __name__ == "__main__":
     main()
@@ -9,6 +9,11 @@ setup_logging()
 
 import asyncio
 import logging
+import os
+from collections import defaultdict
+from typing import List
+from app.core.config import settings
+from app.schemas.telegram import Update
 from app.services.telegram_service import telegram_service
 from app.api.telegram import process_telegram_update
 from app.services.dialogue_tracer_service import clear_debug_logs
@@ -16,6 +21,65 @@ from app.services.dialogue_tracer_service import clear_debug_logs
 # Получаем логгер для этого модуля
 logger = logging.getLogger(__name__)
 
+# Файл, в котором хранится offset между перезапусками бота. Offset относится к конкретному боту,
+# поэтому в имя файла входит id бота (часть токена до ':'): при смене токена старый offset не применяется
+OFFSET_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    f".polling_offset.{settings.TELEGRAM_BOT_TOKEN.split(':', 1)[0]}"
+)
+
+
+def load_offset() -> int:
+    """
+    Загружает сохраненный offset, чтобы после перезапуска не получать старые обновления.
+    """
+    try:
+        with open(OFFSET_FILE, 'r') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return 0
+
+
+def save_offset(offset: int):
+    """
+    Атомарно сохраняет offset: пишем во временный файл и переименовываем.
+    """
+    tmp_path = OFFSET_FILE + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(str(offset))
+        os.replace(tmp_path, OFFSET_FILE)
+    except OSError as e:
+        logger.warning(f"⚠️ Не удалось сохранить offset: {e}")
+
+
+async def process_chat_updates(chat_updates: List[Update]):
+    """
+    Последовательно обрабатывает обновления одного чата, сохраняя порядок сообщений.
+    """
+    for update in chat_updates:
+        # Переиспользуем существующую логику обработки
+        await process_telegram_update(update)
+
+
+async def process_updates_batch(updates: List[Update]):
+    """
+    Обрабатывает пакет обновлений: разные чаты параллельно, сообщения одного чата по порядку.
+    """
+    updates_by_chat = defaultdict(list)
+    for update in updates:
+        chat_id = update.message.chat.id if update.message else None
+        updates_by_chat[chat_id].append(update)
+    
+    results = await asyncio.gather(
+        *(process_chat_updates(chat_updates) for chat_updates in updates_by_chat.values()),
+        return_exceptions=True
+    )
+    
+    for chat_id, result in zip(updates_by_chat, results):
+        if isinstance(result, Exception):
+            logger.error(f"❌ Ошибка обработки обновлений чата {chat_id}: {result}", exc_info=result)
+
 
 async def run_polling():
     """
@@ -41,7 +105,9 @@ async def run_polling():
     
     logger.info("⏳ Ожидание сообщений...")
     
-    offset = 0
+    offset = load_offset()
+    if offset:
+        logger.info(f"📌 Продолжаем с offset {offset}")
     
     while True:
         try:
@@ -51,15 +117,15 @@ async def run_polling():
             if updates:
                 logger.info(f"📩 Получено обновлений: {len(updates)}")
                 
-                # Обрабатываем каждое обновление
-                for update in updates:
-                    # Переиспользуем существующую логику обработки
-                    await process_telegram_update(update)
-                    
-                    # Обновляем offset, чтобы не получать это сообщение снова
-                    offset = update.update_id + 1
+                # Обрабатываем обновления разных чатов конкурентно
+                await process_updates_batch(updates)
+                
+                # Обновляем offset, чтобы не получать эти сообщения снова
+                offset = max(update.update_id for update in updates) + 1
+                save_offset(offset)
                 
-                logger.info("✅ Все обновления обработаны")
+                # Итог пакета нужен только при отладке: на INFO достаточно одной записи на пакет
+                logger.debug("✅ Все обновления обработаны")
                 
         except KeyboardInterrupt:
             logger.info("╔═══════════════════════════════════════════════════════════")
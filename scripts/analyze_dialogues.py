@@ -6,20 +6,110 @@
 в структурированном JSON-файле.
 """
 
+import argparse
 import asyncio
 import json
 import os
-import glob
-from typing import List, Dict, Any
+import hashlib
+import io
+import random
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from pathlib import Path
 
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from google.oauth2 import service_account
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # orjson не установлен - сериализуем стандартным json
+    orjson = None
+
+try:
+    # SDK google-genai нужен только для пакетного режима (--batch)
+    from google import genai as genai_batch
+except ImportError:
+    genai_batch = None
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
+# Максимум одновременных запросов к Gemini (ограничение по квоте запросов в минуту)
+DEFAULT_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+
+# Повторы запросов к Gemini при превышении квоты или временной недоступности
+GEMINI_MAX_ATTEMPTS = 5
+GEMINI_MAX_BACKOFF = 60
+RETRYABLE_GEMINI_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)
+
+# Ошибки, которыми Gemini отвечает на обращение к удаленному или истекшему кешу контекста
+PREFIX_CACHE_UNAVAILABLE_ERRORS = (google_exceptions.NotFound, google_exceptions.PermissionDenied)
+
+# Версия промпта анализа: меняйте при любой правке промпта, чтобы сбросить кеш ответов
+PROMPT_VERSION = "v1"
+
+# Модель Gemini для анализа диалогов
+MODEL_NAME = "gemini-2.5-flash"
+
+# Время жизни кеша контекста со статической частью промпта
+PROMPT_CACHE_TTL = timedelta(hours=1)
+
+# Интервал опроса статуса пакетного задания (секунды) и его конечные состояния
+BATCH_POLL_INTERVAL = 30
+BATCH_FINAL_STATES = frozenset({
+    'JOB_STATE_SUCCEEDED', 'JOB_STATE_FAILED', 'JOB_STATE_CANCELLED', 'JOB_STATE_EXPIRED'
+})
+
+# Статическая часть промпта анализа (до текста диалога); кешируется через Gemini Context Caching
+ANALYSIS_PROMPT_PREFIX = """
+Твоя задача — выступить в роли опытного бизнес-аналитика и проанализировать диалог менеджера салона красоты с клиентом. Твоя цель — извлечь из него только **самые качественные, универсальные и переиспользуемые "Паттерны Диалога"**, которые можно использовать для обучения AI-ассистента.
+
+**Игнорируй тривиальные, специфичные или неудачные части диалога.** Сосредоточься только на тех моментах, где менеджер демонстрирует **образцовое поведение**.
+
+Один диалог может содержать НЕСКОЛЬКО таких образцовых паттернов.
+
+Для каждого найденного **качественного** паттерна ты должен определить:
+1.  `stage`: Короткий, уникальный ID стадии диалога на английском. Используй один из следующих: `greeting` (приветствие/начало диалога), `service_inquiry` (вопрос об услугах), `price_inquiry` (вопрос о цене), `availability_check` (проверка свободного времени), `booking_confirmation` (подтверждение записи), `rescheduling` (перенос записи), `cancellation` (отмена записи), `handle_issue` (решение проблемы клиента), `logistics` (вопросы адреса/парковки). **Если паттерн не подходит ни под одну из этих стадий, проигнорируй его.**
+2.  `principles`: JSON-массив из 1-2 ключевых принципов, которые можно извлечь из **образцового** ответа менеджера. Принципы должны быть сформулированы как универсальные инструкции.
+3.  `examples`: JSON-массив, содержащий **только один, самый лучший и показательный** пример реплик "вопрос-ответ" с этой стадии в формате `{"user": "...", "assistant": "..."}`. Пример должен быть очищен от лишних деталей и легко адаптируем.
+4.  `proactive_params`: JSON-объект, описывающий, какие параметры для инструментов бот может определить самостоятельно на этой стадии. Формат: `{"tool_name": {"param_name": "описание логики определения параметра"}}`. Например: `{"get_available_slots": {"date": "Если пользователь просит 'ближайшее' или 'скорее', используй 'сегодня' в качестве даты по умолчанию"}}`. Если для стадии нет параметров для самостоятельного определения, используй пустой объект `{}`.
+
+Проанализируй следующий диалог:
+---
+"""
+
+# Завершающая часть промпта анализа (после текста диалога)
+ANALYSIS_PROMPT_SUFFIX = """
+---
+
+Выдай результат в формате JSON-массива объектов. Если в диалоге нет ни одного образцового паттерна, верни пустой массив `[]`.
+"""
+
+# Диалоги больше этого размера (байт) передаются в Gemini файлом через Files API
+FILE_UPLOAD_THRESHOLD = 8 * 1024
+
+# Строка выгрузки чата: [время] ~Отправитель: сообщение (в начале может стоять метка U+200E)
+_MESSAGE_LINE_RE = re.compile(r'\[[^\]]*\] ~?(?P<sender>[^:]*?): (?P<message>.*)')
+
+# Имена, по которым отправитель считается менеджером (ищутся в имени в нижнем регистре)
+_MANAGER_NAME_RE = re.compile(r'daria|менеджер|администратор')
+
+# Декодер для разбора JSON-массива из середины ответа модели
+_JSON_DECODER = json.JSONDecoder()
+
+# Кеш разобранных ответов Gemini: <sha256 версии промпта и текста диалога>.json
+CACHE_DIR = Path(".cache") / "dialogue_patterns"
+
+
+class PatternExtractionError(Exception):
+    """Не удалось получить паттерны диалога от Gemini."""
+
 
 class DialogueAnalyzer:
     """AI-аналитик для анализа диалогов и извлечения паттернов."""
@@ -27,7 +117,11 @@ class DialogueAnalyzer:
     def __init__(self):
         """Инициализирует клиент Gemini для анализа диалогов."""
         self._setup_gemini_client()
-        self._model = genai.GenerativeModel("gemini-2.5-flash")
+        self._model = genai.GenerativeModel(MODEL_NAME)
+        self._prefix_cache: Optional[genai.caching.CachedContent] = None
+        self._cached_prefix_model: Optional[genai.GenerativeModel] = None
+        self._prefix_cache_attempted = False
+        self._prefix_cache_lock = asyncio.Lock()
     
     def _setup_gemini_client(self):
         """Настраивает клиент Gemini с учетными данными."""
@@ -73,6 +167,198 @@ class DialogueAnalyzer:
         )
         return credentials
     
+    def _build_prompt(self, dialogue_text: str) -> str:
+        """
+        Формирует полный промпт анализа диалога для Gemini.
+        
+        Args:
+            dialogue_text: Текст диалога для анализа
+            
+        Returns:
+            Текст промпта
+        """
+        return ANALYSIS_PROMPT_PREFIX + self._build_dialogue_part(dialogue_text)
+    
+    def _build_dialogue_part(self, dialogue_text: str) -> str:
+        """
+        Формирует изменяемую часть промпта: диалог и итоговую инструкцию.
+        
+        Args:
+            dialogue_text: Текст диалога для анализа
+            
+        Returns:
+            Часть промпта, идущая после ANALYSIS_PROMPT_PREFIX
+        """
+        return dialogue_text + ANALYSIS_PROMPT_SUFFIX
+    
+    def _build_request_contents(self, dialogue_text: str, dialogue_file, include_prefix: bool):
+        """
+        Формирует содержимое запроса к Gemini.
+        
+        Args:
+            dialogue_text: Текст диалога для анализа
+            dialogue_file: Загруженный через Files API файл с диалогом (или None)
+            include_prefix: Добавлять ли статическую часть промпта (False, если она в кеше контекста)
+            
+        Returns:
+            Строка промпта или список частей запроса со ссылкой на файл
+        """
+        if dialogue_file is None:
+            return self._build_prompt(dialogue_text) if include_prefix else self._build_dialogue_part(dialogue_text)
+        
+        contents = [dialogue_file, ANALYSIS_PROMPT_SUFFIX]
+        if include_prefix:
+            contents.insert(0, ANALYSIS_PROMPT_PREFIX)
+        return contents
+    
+    async def _upload_dialogue(self, dialogue_text: str):
+        """
+        Загружает текст диалога в Gemini Files API.
+        
+        Args:
+            dialogue_text: Текст диалога
+            
+        Returns:
+            Загруженный файл или None, если загрузить не удалось (тогда диалог отправляется в промпте)
+        """
+        try:
+            return await asyncio.to_thread(
+                genai.upload_file,
+                io.BytesIO(dialogue_text.encode('utf-8')),
+                mime_type='text/plain',
+            )
+        except Exception as e:
+            print(f"Не удалось загрузить диалог в Files API, отправляем его в промпте: {e}")
+            return None
+    
+    async def _delete_uploaded_dialogue(self, dialogue_file):
+        """
+        Удаляет загруженный файл диалога, чтобы не расходовать квоту хранилища.
+        
+        Args:
+            dialogue_file: Файл, загруженный через Files API
+        """
+        try:
+            await asyncio.to_thread(genai.delete_file, dialogue_file.name)
+        except Exception as e:
+            print(f"Не удалось удалить файл {dialogue_file.name}: {e}")
+    
+    async def _get_cached_prefix_model(self) -> Optional[genai.GenerativeModel]:
+        """
+        Возвращает модель, у которой статическая часть промпта уже лежит в кеше контекста Gemini.
+        
+        Кеш создается один раз при первом обращении; блокирующий вызов SDK выполняется
+        в отдельном потоке, а блокировка не дает параллельным задачам создать несколько
+        кешей. Если создать его не удалось (например, префикс короче минимального размера
+        кеша для модели), возвращается None и запросы отправляются с полным промптом.
+        
+        Returns:
+            Модель с кешированным префиксом или None
+        """
+        async with self._prefix_cache_lock:
+            if not self._prefix_cache_attempted:
+                self._prefix_cache_attempted = True
+                try:
+                    self._prefix_cache = await asyncio.to_thread(
+                        genai.caching.CachedContent.create,
+                        model=f"models/{MODEL_NAME}",
+                        display_name=f"dialogue-analysis-prefix-{PROMPT_VERSION}",
+                        contents=[ANALYSIS_PROMPT_PREFIX],
+                        ttl=PROMPT_CACHE_TTL,
+                    )
+                    self._cached_prefix_model = genai.GenerativeModel.from_cached_content(
+                        cached_content=self._prefix_cache
+                    )
+                except Exception as e:
+                    print(f"Кеш контекста недоступен, отправляем полный промпт: {e}")
+        return self._cached_prefix_model
+    
+    async def _delete_prefix_cache(self):
+        """Удаляет кеш контекста с префиксом промпта, чтобы не платить за его хранение до истечения TTL."""
+        prefix_cache = self._prefix_cache
+        self._prefix_cache = None
+        self._cached_prefix_model = None
+        self._prefix_cache_attempted = False
+        if prefix_cache is None:
+            return
+        try:
+            await asyncio.to_thread(prefix_cache.delete)
+        except Exception as e:
+            print(f"Не удалось удалить кеш контекста {prefix_cache.name}: {e}")
+    
+    def _parse_patterns_response(self, response_text: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Извлекает и валидирует паттерны из текстового ответа Gemini.
+        
+        Args:
+            response_text: Текст ответа модели
+            
+        Returns:
+            Список проверенных паттернов или None, если JSON в ответе не найден или некорректен
+        """
+        response_text = response_text.strip()
+        
+        # Пытаемся найти JSON в ответе
+        json_start = response_text.find('[')
+        
+        if json_start == -1:
+            print(f"Не удалось найти JSON в ответе: {response_text}")
+            return None
+        
+        # Разбираем массив прямо с позиции '[' без копирования среза; текст после массива игнорируется
+        try:
+            patterns, _ = _JSON_DECODER.raw_decode(response_text, json_start)
+        except json.JSONDecodeError as json_err:
+            print(f"Ошибка парсинга JSON: {json_err}")
+            print(f"Проблемный JSON: {response_text[json_start:]}")
+            return None
+        
+        if not isinstance(patterns, list):
+            print(f"Ответ модели не является JSON-массивом: {response_text}")
+            return None
+        
+        # Валидируем структуру паттернов
+        return [self._normalize_pattern(pattern) for pattern in patterns
+                if isinstance(pattern, dict) and 'stage' in pattern]
+    
+    def _normalize_pattern(self, pattern: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Приводит паттерн к ожидаемой структуре.
+        
+        Args:
+            pattern: Паттерн из ответа модели или из кеша
+            
+        Returns:
+            Паттерн со списком строк в principles и списком пар реплик в examples
+        """
+        # Одиночный пример модель может вернуть объектом, а не массивом
+        examples = pattern.get('examples', [])
+        if isinstance(examples, dict):
+            examples = [examples]
+        elif not isinstance(examples, list):
+            examples = []
+        
+        # Принципы - список строк (одиночную строку оборачиваем в список)
+        principles = pattern.get('principles', [])
+        if isinstance(principles, str):
+            principles = [principles]
+        elif not isinstance(principles, list):
+            principles = []
+        
+        proactive_params = pattern.get('proactive_params', {})
+        
+        return {
+            'stage': pattern.get('stage', ''),
+            'principles': [principle for principle in principles if isinstance(principle, str)],
+            # Оставляем только примеры, где обе реплики - строки
+            'examples': [
+                ex for ex in examples
+                if isinstance(ex, dict)
+                and isinstance(ex.get('user'), str) and isinstance(ex.get('assistant'), str)
+            ],
+            'proactive_params': proactive_params if isinstance(proactive_params, dict) else {}
+        }
+    
     async def extract_patterns_from_dialogue(self, dialogue_text: str) -> List[Dict[str, Any]]:
         """
         Извлекает паттерны диалога с помощью Gemini AI.
@@ -83,79 +369,124 @@ class DialogueAnalyzer:
         Returns:
             Список словарей с паттернами диалога
         """
-        prompt = f"""
-Твоя задача — выступить в роли опытного бизнес-аналитика и проанализировать диалог менеджера салона красоты с клиентом. Твоя цель — извлечь из него только **самые качественные, универсальные и переиспользуемые "Паттерны Диалога"**, которые можно использовать для обучения AI-ассистента.
-
-**Игнорируй тривиальные, специфичные или неудачные части диалога.** Сосредоточься только на тех моментах, где менеджер демонстрирует **образцовое поведение**.
-
-Один диалог может содержать НЕСКОЛЬКО таких образцовых паттернов.
-
-Для каждого найденного **качественного** паттерна ты должен определить:
-1.  `stage`: Короткий, уникальный ID стадии диалога на английском. Используй один из следующих: `greeting` (приветствие/начало диалога), `service_inquiry` (вопрос об услугах), `price_inquiry` (вопрос о цене), `availability_check` (проверка свободного времени), `booking_confirmation` (подтверждение записи), `rescheduling` (перенос записи), `cancellation` (отмена записи), `handle_issue` (решение проблемы клиента), `logistics` (вопросы адреса/парковки). **Если паттерн не подходит ни под одну из этих стадий, проигнорируй его.**
-2.  `principles`: JSON-массив из 1-2 ключевых принципов, которые можно извлечь из **образцового** ответа менеджера. Принципы должны быть сформулированы как универсальные инструкции.
-3.  `examples`: JSON-массив, содержащий **только один, самый лучший и показательный** пример реплик "вопрос-ответ" с этой стадии в формате `{{"user": "...", "assistant": "..."}}`. Пример должен быть очищен от лишних деталей и легко адаптируем.
-4.  `proactive_params`: JSON-объект, описывающий, какие параметры для инструментов бот может определить самостоятельно на этой стадии. Формат: `{{"tool_name": {{"param_name": "описание логики определения параметра"}}}}`. Например: `{{"get_available_slots": {{"date": "Если пользователь просит 'ближайшее' или 'скорее', используй 'сегодня' в качестве даты по умолчанию"}}}}`. Если для стадии нет параметров для самостоятельного определения, используй пустой объект `{{}}`.
-
-Проанализируй следующий диалог:
----
-{dialogue_text}
----
-
-Выдай результат в формате JSON-массива объектов. Если в диалоге нет ни одного образцового паттерна, верни пустой массив `[]`.
-"""
+        # Неизмененный диалог уже разобран при прошлом запуске - повторно в Gemini не отправляем
+        cache_path = self._get_cache_path(dialogue_text)
+        cached_patterns = self._load_from_cache(cache_path)
+        if cached_patterns is not None:
+            return cached_patterns
         
         try:
-            # Используем asyncio для выполнения синхронного вызова
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self._model.generate_content(prompt)
-            )
+            response = await self._generate_with_retry(dialogue_text)
             
-            # Получаем текст ответа
-            response_text = response.text.strip()
+            validated_patterns = self._parse_patterns_response(response.text)
+            if validated_patterns is None:
+                return []
             
-            # Пытаемся найти JSON в ответе
-            json_start = response_text.find('[')
-            json_end = response_text.rfind(']') + 1
+            self._save_to_cache(cache_path, validated_patterns)
+            return validated_patterns
             
-            if json_start != -1 and json_end != 0:
-                json_text = response_text[json_start:json_end]
-                try:
-                    patterns = json.loads(json_text)
-                    # Валидируем структуру паттернов
-                    validated_patterns = []
-                    for pattern in patterns:
-                        if isinstance(pattern, dict) and 'stage' in pattern:
-                            validated_pattern = {
-                                'stage': pattern.get('stage', ''),
-                                'principles': pattern.get('principles', []),
-                                'examples': pattern.get('examples', []),
-                                'proactive_params': pattern.get('proactive_params', {})
-                            }
-                            # Фильтруем некорректные примеры
-                            if isinstance(validated_pattern['examples'], list):
-                                validated_pattern['examples'] = [
-                                    ex for ex in validated_pattern['examples'] 
-                                    if isinstance(ex, dict) and 'user' in ex and 'assistant' in ex
-                                ]
-                            validated_patterns.append(validated_pattern)
-                    return validated_patterns
-                except json.JSONDecodeError as json_err:
-                    print(f"Ошибка парсинга JSON: {json_err}")
-                    print(f"Проблемный JSON: {json_text}")
-                    return []
-            else:
-                print(f"Не удалось найти JSON в ответе: {response_text}")
-                return []
-                
-        except json.JSONDecodeError as e:
-            print(f"Ошибка парсинга JSON: {e}")
-            print(f"Ответ модели: {response_text}")
-            return []
         except Exception as e:
-            print(f"Ошибка при анализе диалога: {e}")
-            return []
+            # Ошибку не превращаем в пустой результат: иначе сбой запроса неотличим от диалога без паттернов
+            print(f"Ошибка при анализе диалога: {e}\n{traceback.format_exc()}")
+            raise PatternExtractionError(str(e)) from e
+    
+    async def _generate_with_retry(self, dialogue_text: str):
+        """
+        Отправляет диалог в Gemini, повторяя запрос при превышении квоты или недоступности сервиса.
+        
+        Args:
+            dialogue_text: Текст диалога для анализа
+            
+        Returns:
+            Ответ модели
+        """
+        # Длинный диалог загружаем один раз через Files API: повторные запросы передают только ссылку на файл
+        dialogue_file = None
+        if len(dialogue_text.encode('utf-8')) > FILE_UPLOAD_THRESHOLD:
+            dialogue_file = await self._upload_dialogue(dialogue_text)
+        
+        try:
+            for attempt in range(GEMINI_MAX_ATTEMPTS):
+                try:
+                    # Нативный асинхронный вызов SDK: не занимает потоки пула исполнителей.
+                    # Если статическая часть промпта в кеше контекста, отправляем только диалог
+                    cached_prefix_model = await self._get_cached_prefix_model()
+                    if cached_prefix_model is not None:
+                        try:
+                            return await cached_prefix_model.generate_content_async(
+                                self._build_request_contents(dialogue_text, dialogue_file, include_prefix=False)
+                            )
+                        except PREFIX_CACHE_UNAVAILABLE_ERRORS as e:
+                            # Кеш истек или удален: дальше отправляем полный промпт без кеша
+                            if self._cached_prefix_model is cached_prefix_model:
+                                print(f"Кеш контекста больше недоступен, отправляем полный промпт: {e}")
+                                self._cached_prefix_model = None
+                    return await self._model.generate_content_async(
+                        self._build_request_contents(dialogue_text, dialogue_file, include_prefix=True)
+                    )
+                except RETRYABLE_GEMINI_ERRORS as e:
+                    if attempt == GEMINI_MAX_ATTEMPTS - 1:
+                        raise
+                    # Экспоненциальная задержка со случайной добавкой, чтобы запросы не повторялись синхронно
+                    delay = min(GEMINI_MAX_BACKOFF, 2 ** attempt + random.random())
+                    print(f"Gemini вернул {type(e).__name__}, повтор через {delay:.1f} с (попытка {attempt + 2} из {GEMINI_MAX_ATTEMPTS})")
+                    await asyncio.sleep(delay)
+        finally:
+            if dialogue_file is not None:
+                await self._delete_uploaded_dialogue(dialogue_file)
+    
+    def _get_cache_path(self, dialogue_text: str) -> Path:
+        """
+        Возвращает путь к файлу кеша для диалога.
+        
+        Args:
+            dialogue_text: Текст диалога
+            
+        Returns:
+            Путь к JSON-файлу кеша (ключ - sha256 версии промпта и текста)
+        """
+        key = hashlib.sha256(f"{PROMPT_VERSION}\n{dialogue_text}".encode('utf-8')).hexdigest()
+        return CACHE_DIR / f"{key}.json"
+    
+    def _load_from_cache(self, cache_path: Path) -> Optional[List[Dict[str, Any]]]:
+        """
+        Загружает паттерны диалога из кеша.
+        
+        Args:
+            cache_path: Путь к файлу кеша
+            
+        Returns:
+            Сохраненные паттерны или None, если кеша нет или он поврежден
+        """
+        if not cache_path.exists():
+            return None
+        try:
+            patterns = json.loads(cache_path.read_text(encoding='utf-8'))
+            if not isinstance(patterns, list):
+                print(f"Кеш {cache_path} поврежден, диалог будет проанализирован заново")
+                return None
+            # Записи могли сохраниться до ужесточения проверки - нормализуем их так же, как ответ модели
+            return [self._normalize_pattern(pattern) for pattern in patterns
+                    if isinstance(pattern, dict) and 'stage' in pattern]
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Не удалось прочитать кеш {cache_path}: {e}")
+            return None
+    
+    def _save_to_cache(self, cache_path: Path, patterns: List[Dict[str, Any]]):
+        """
+        Атомарно сохраняет разобранные паттерны в кеш.
+        
+        Args:
+            cache_path: Путь к файлу кеша
+            patterns: Проверенные паттерны диалога
+        """
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(patterns, ensure_ascii=False), encoding='utf-8')
+            tmp_path.replace(cache_path)
+        except OSError as e:
+            print(f"Не удалось сохранить кеш {cache_path}: {e}")
     
     def clean_dialogue_text(self, text: str) -> str:
         """
@@ -167,43 +498,38 @@ class DialogueAnalyzer:
         Returns:
             Очищенный текст диалога
         """
-        lines = text.split('\n')
-        cleaned_lines = []
+        return '\n'.join(self.clean_dialogue_lines(text.split('\n')))
+    
+    def clean_dialogue_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """
+        Построчно очищает диалог от временных меток и форматирует для анализа.
+        
+        Принимает любой итерируемый источник строк (в том числе открытый файл),
+        поэтому большие выгрузки чатов не загружаются в память целиком.
         
+        Args:
+            lines: Строки исходного диалога
+            
+        Yields:
+            Очищенные строки диалога
+        """
         for line in lines:
             line = line.strip()
             if not line:
                 continue
-                
+            
             # Убираем временные метки WhatsApp/Telegram формата
             # [5/26/25, 1:37:26 PM] ~Daria: сообщение
-            if ']' in line and ':' in line:
-                # Ищем паттерн: [время] имя: сообщение
-                # Находим позицию последнего ': '
-                colon_pos = line.rfind(': ')
-                if colon_pos != -1:
-                    # Берем все после последнего ': '
-                    message_part = line[colon_pos + 2:]
-                    
-                    # Берем часть до ': ' и извлекаем имя отправителя
-                    before_colon = line[:colon_pos]
-                    # Ищем имя после последнего '] '
-                    bracket_pos = before_colon.rfind('] ')
-                    if bracket_pos != -1:
-                        sender_name = before_colon[bracket_pos + 2:].replace('~', '').strip()
-                        
-                        # Определяем, кто говорит (клиент или менеджер)
-                        if any(name in sender_name.lower() for name in ['daria', 'менеджер', 'администратор']):
-                            # Это менеджер
-                            cleaned_lines.append(f"Менеджер: {message_part}")
-                        else:
-                            # Это клиент
-                            cleaned_lines.append(f"Клиент: {message_part}")
-            else:
+            match = _MESSAGE_LINE_RE.search(line)
+            if match:
+                # Определяем, кто говорит (клиент или менеджер)
+                if _MANAGER_NAME_RE.search(match['sender'].lower()):
+                    yield f"Менеджер: {match['message']}"
+                else:
+                    yield f"Клиент: {match['message']}"
+            elif ']' not in line or ':' not in line:
                 # Если строка не содержит временных меток, добавляем как есть
-                cleaned_lines.append(line)
-        
-        return '\n'.join(cleaned_lines)
+                yield line
     
     def load_dialogues_from_directory(self, directory_path: str) -> List[str]:
         """
@@ -223,67 +549,52 @@ class DialogueAnalyzer:
             return dialogues
         
         # Ищем все текстовые файлы
-        text_files = glob.glob(str(directory / "*.txt"))
-        
-        for file_path in text_files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:
-                        # Очищаем диалог от временных меток
-                        cleaned_content = self.clean_dialogue_text(content)
-                        dialogues.append(cleaned_content)
-                        print(f"Загружен диалог из {file_path}")
-            except Exception as e:
-                print(f"Ошибка при загрузке файла {file_path}: {e}")
+        with os.scandir(directory) as entries:
+            text_files = [
+                entry.path for entry in entries
+                if entry.name.endswith('.txt') and not entry.name.startswith('.')
+                and entry.is_file(follow_symlinks=False)
+            ]
+        if not text_files:
+            return dialogues
+        
+        # Файлы читаются параллельно: чтение - ввод-вывод, GIL на нем освобождается
+        with ThreadPoolExecutor(max_workers=min(32, len(text_files))) as executor:
+            for cleaned_content in executor.map(self._load_and_clean_one, text_files):
+                if cleaned_content:
+                    dialogues.append(cleaned_content)
         
         return dialogues
     
-    def merge_patterns(self, all_patterns: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    def _load_and_clean_one(self, file_path: str) -> Optional[str]:
         """
-        Объединяет паттерны по стадиям, удаляя дубликаты.
+        Загружает и очищает один файл с диалогом.
         
         Args:
-            all_patterns: Словарь с паттернами по стадиям
+            file_path: Путь к текстовому файлу
             
         Returns:
-            Объединенный словарь паттернов
+            Очищенный текст диалога или None при ошибке чтения
         """
-        merged_patterns = {}
-        
-        for stage, pattern_data in all_patterns.items():
-            # Объединяем принципы и удаляем дубликаты
-            all_principles = []
-            for principles in pattern_data.get('principles', []):
-                all_principles.extend(principles)
-            
-            unique_principles = list(dict.fromkeys(all_principles))  # Сохраняем порядок
-            
-            # Объединяем примеры
-            all_examples = []
-            for examples in pattern_data.get('examples', []):
-                all_examples.extend(examples)
-            
-            # Объединяем proactive_params
-            merged_proactive_params = {}
-            for proactive_params in pattern_data.get('proactive_params', []):
-                if isinstance(proactive_params, dict):
-                    merged_proactive_params.update(proactive_params)
-            
-            merged_patterns[stage] = {
-                'principles': unique_principles,
-                'examples': all_examples,
-                'proactive_params': merged_proactive_params
-            }
-        
-        return merged_patterns
+        try:
+            # Очищаем диалог от временных меток, читая файл построчно
+            with open(file_path, 'r', encoding='utf-8') as f:
+                cleaned_content = '\n'.join(self.clean_dialogue_lines(f))
+            if cleaned_content:
+                print(f"Загружен диалог из {file_path}")
+            return cleaned_content
+        except Exception as e:
+            print(f"Ошибка при загрузке файла {file_path}: {e}")
+            return None
     
-    async def analyze_all_dialogues(self, source_directory: str = "source_dialogues") -> Dict[str, Dict[str, Any]]:
+    async def analyze_all_dialogues(self, source_directory: str = "source_dialogues",
+                                    concurrency: int = DEFAULT_CONCURRENCY) -> Dict[str, Dict[str, Any]]:
         """
         Анализирует все диалоги и возвращает объединенные паттерны.
         
         Args:
             source_directory: Путь к директории с исходными диалогами
+            concurrency: Максимальное число одновременных запросов к Gemini
             
         Returns:
             Словарь с объединенными паттернами по стадиям
@@ -297,16 +608,56 @@ class DialogueAnalyzer:
         
         print(f"Найдено {len(dialogues)} диалогов для анализа")
         
-        all_patterns = {}
+        # Одинаковые диалоги (пересланные чаты, повторные выгрузки) анализируем один раз
+        unique_dialogues, order = self._index_unique_dialogues(dialogues)
         
-        # Асинхронно обрабатываем каждый диалог
+        # Асинхронно обрабатываем каждый диалог, ограничивая число одновременных запросов
+        semaphore = asyncio.Semaphore(concurrency)
         tasks = []
-        for i, dialogue in enumerate(dialogues):
-            task = self.process_dialogue(dialogue, i)
+        for i, dialogue in enumerate(unique_dialogues):
+            task = self.process_dialogue(dialogue, i, semaphore)
             tasks.append(task)
         
         print("Начинаем анализ диалогов...")
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            unique_results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await self._delete_prefix_cache()
+        
+        # Возвращаем результат каждому исходному диалогу, включая дубликаты
+        return self.merge_patterns([unique_results[k] for k in order])
+    
+    def _index_unique_dialogues(self, dialogues: List[str]) -> Tuple[List[str], List[int]]:
+        """
+        Убирает повторяющиеся диалоги, запоминая соответствие исходным позициям.
+        
+        Args:
+            dialogues: Тексты диалогов в исходном порядке
+            
+        Returns:
+            Кортеж (уникальные диалоги, индекс уникального диалога для каждого исходного)
+        """
+        unique_index: Dict[str, int] = {}
+        order = [unique_index.setdefault(dialogue, len(unique_index)) for dialogue in dialogues]
+        
+        if len(unique_index) < len(dialogues):
+            print(f"Пропущено повторяющихся диалогов: {len(dialogues) - len(unique_index)}")
+        return list(unique_index), order
+    
+    def merge_patterns(self, results: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Объединяет паттерны всех диалогов по стадиям за один проход, удаляя дубликаты.
+        
+        Args:
+            results: Списки паттернов по диалогам (или исключения при ошибках)
+            
+        Returns:
+            Словарь с объединенными паттернами по стадиям
+        """
+        merged_patterns = {}
+        # Уже добавленные принципы и пары реплик по стадиям (порядок в результате сохраняется)
+        seen_principles: Dict[str, set] = {}
+        seen_examples: Dict[str, set] = {}
         
         # Обрабатываем результаты
         for i, result in enumerate(results):
@@ -314,43 +665,146 @@ class DialogueAnalyzer:
                 print(f"Ошибка при обработке диалога {i}: {result}")
                 continue
             
-            patterns = result
-            for pattern in patterns:
+            for pattern in result:
                 stage = pattern.get('stage')
                 if not stage:
                     continue
                 
-                if stage not in all_patterns:
-                    all_patterns[stage] = {
+                stage_patterns = merged_patterns.get(stage)
+                if stage_patterns is None:
+                    stage_patterns = merged_patterns[stage] = {
                         'principles': [],
                         'examples': [],
-                        'proactive_params': []
+                        'proactive_params': {}
                     }
+                    seen_principles[stage] = set()
+                    seen_examples[stage] = set()
                 
-                # Добавляем принципы, примеры и proactive_params
-                all_patterns[stage]['principles'].append(pattern.get('principles', []))
-                all_patterns[stage]['examples'].append(pattern.get('examples', []))
-                all_patterns[stage]['proactive_params'].append(pattern.get('proactive_params', {}))
-        
-        # Объединяем паттерны
-        merged_patterns = self.merge_patterns(all_patterns)
+                stage_principles = seen_principles[stage]
+                for principle in pattern.get('principles', []):
+                    if principle not in stage_principles:
+                        stage_principles.add(principle)
+                        stage_patterns['principles'].append(principle)
+                
+                # Повторы одной и той же пары реплик пропускаем
+                stage_examples = seen_examples[stage]
+                for example in pattern.get('examples', []):
+                    if not isinstance(example, dict):
+                        continue
+                    example_key = (example.get('user'), example.get('assistant'))
+                    if not all(isinstance(part, str) for part in example_key):
+                        continue
+                    if example_key not in stage_examples:
+                        stage_examples.add(example_key)
+                        stage_patterns['examples'].append(example)
+                
+                proactive_params = pattern.get('proactive_params', {})
+                if isinstance(proactive_params, dict):
+                    stage_patterns['proactive_params'].update(proactive_params)
         
         print(f"Найдено {len(merged_patterns)} уникальных стадий диалога")
         return merged_patterns
     
-    async def process_dialogue(self, dialogue: str, index: int) -> List[Dict[str, Any]]:
+    async def analyze_all_dialogues_batch(self, source_directory: str = "source_dialogues") -> Dict[str, Dict[str, Any]]:
+        """
+        Анализирует диалоги одним пакетным заданием Gemini Batch API.
+        
+        Пакетные запросы тарифицируются примерно вдвое дешевле интерактивных и не
+        расходуют поминутную квоту, но результат приходит с задержкой. Подходит для
+        офлайн-анализа большого числа диалогов.
+        
+        Args:
+            source_directory: Путь к директории с исходными диалогами
+            
+        Returns:
+            Словарь с объединенными паттернами по стадиям
+        """
+        if genai_batch is None:
+            raise RuntimeError("Для пакетного режима установите пакет google-genai: pip install google-genai")
+        
+        print("Загружаем диалоги из директории...")
+        dialogues = self.load_dialogues_from_directory(source_directory)
+        
+        if not dialogues:
+            print("Диалоги не найдены!")
+            return {}
+        
+        print(f"Найдено {len(dialogues)} диалогов для анализа")
+        
+        # Одинаковые диалоги отправляем в пакет один раз
+        unique_dialogues, order = self._index_unique_dialogues(dialogues)
+        
+        # В пакет отправляем только диалоги, которых еще нет в кеше
+        results: List[Any] = [self._load_from_cache(self._get_cache_path(dialogue)) for dialogue in unique_dialogues]
+        pending = [i for i, patterns in enumerate(results) if patterns is None]
+        
+        if pending:
+            # Ключ API берется из переменной окружения GEMINI_API_KEY или GOOGLE_API_KEY
+            client = genai_batch.Client()
+            inline_requests = [
+                {'contents': [{'parts': [{'text': self._build_prompt(unique_dialogues[i])}], 'role': 'user'}]}
+                for i in pending
+            ]
+            
+            # Клиент google-genai синхронный: вызовы выполняем в отдельном потоке
+            job = await asyncio.to_thread(
+                client.batches.create,
+                model=f"models/{MODEL_NAME}",
+                src=inline_requests,
+                config={'display_name': f"dialogue-patterns-{PROMPT_VERSION}"},
+            )
+            print(f"Создано пакетное задание {job.name} ({len(pending)} диалогов)")
+            
+            while job.state.name not in BATCH_FINAL_STATES:
+                await asyncio.sleep(BATCH_POLL_INTERVAL)
+                job = await asyncio.to_thread(client.batches.get, name=job.name)
+                print(f"Статус пакетного задания: {job.state.name}")
+            
+            if job.state.name != 'JOB_STATE_SUCCEEDED':
+                raise RuntimeError(f"Пакетное задание {job.name} завершилось со статусом {job.state.name}")
+            
+            # Ответы возвращаются в порядке запросов
+            for i, inline_response in zip(pending, job.dest.inlined_responses):
+                if inline_response.error:
+                    results[i] = RuntimeError(str(inline_response.error))
+                    continue
+                
+                # Заблокированный ответ или ответ без текстовых частей приходит без text
+                response_text = inline_response.response.text if inline_response.response else None
+                if response_text is None:
+                    results[i] = RuntimeError("Пакетное задание вернуло ответ без текста")
+                    continue
+                
+                patterns = self._parse_patterns_response(response_text)
+                if patterns is None:
+                    results[i] = []
+                    continue
+                
+                self._save_to_cache(self._get_cache_path(unique_dialogues[i]), patterns)
+                results[i] = patterns
+        
+        for i, patterns in enumerate(results):
+            if not isinstance(patterns, Exception):
+                print(f"Диалог {i + 1}: найдено {len(patterns)} паттернов")
+        
+        return self.merge_patterns([results[k] for k in order])
+    
+    async def process_dialogue(self, dialogue: str, index: int,
+                               semaphore: Optional[asyncio.Semaphore] = None) -> List[Dict[str, Any]]:
         """
         Обрабатывает один диалог и возвращает найденные паттерны.
         
         Args:
             dialogue: Текст диалога
             index: Индекс диалога для логирования
+            semaphore: Семафор, ограничивающий число одновременных запросов к Gemini
             
         Returns:
             Список найденных паттернов
         """
-        print(f"Анализируем диалог {index + 1}...")
-        patterns = await self.extract_patterns_from_dialogue(dialogue)
+        async with semaphore or nullcontext():
+            print(f"Анализируем диалог {index + 1}...")
+            patterns = await self.extract_patterns_from_dialogue(dialogue)
         print(f"Диалог {index + 1}: найдено {len(patterns)} паттернов")
         return patterns
     
@@ -363,8 +817,12 @@ class DialogueAnalyzer:
             output_file: Путь к выходному файлу
         """
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(patterns, f, ensure_ascii=False, indent=2)
+            # Сериализуем целиком и пишем одной операцией; формат тот же, что у json.dump(indent=2)
+            if orjson is not None:
+                data = orjson.dumps(patterns, option=orjson.OPT_INDENT_2)
+            else:
+                data = json.dumps(patterns, ensure_ascii=False, indent=2).encode('utf-8')
+            Path(output_file).write_bytes(data)
             print(f"Паттерны сохранены в файл {output_file}")
         except Exception as e:
             print(f"Ошибка при сохранении файла {output_file}: {e}")
@@ -372,13 +830,24 @@ class DialogueAnalyzer:
 
 async def main():
     """Основная функция скрипта."""
+    parser = argparse.ArgumentParser(description="AI-аналитик диалогов")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="отправить диалоги одним пакетным заданием Gemini Batch API (дешевле, но дольше)"
+    )
+    args = parser.parse_args()
+    
     print("=== AI-Аналитик диалогов ===")
     print("Запускаем анализ диалогов и генерацию паттернов...")
     
     analyzer = DialogueAnalyzer()
     
     # Анализируем все диалоги
-    patterns = await analyzer.analyze_all_dialogues()
+    if args.batch:
+        patterns = await analyzer.analyze_all_dialogues_batch()
+    else:
+        patterns = await analyzer.analyze_all_dialogues()
     
     if patterns:
         # Сохраняем результат